@@ -1,162 +1,400 @@
 import json
+import math
 import os
+import re
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
 import zipfile
 import tempfile
+from itertools import repeat
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import sys
 
-def package_slack_jsons_with_report(input_dir, output_zip=None):
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = njit = None
+
+
+class _NonFiniteFloat(float):
+    """
+    NaN/Infinity parsed by the json fallback, whether written as such or as a literal
+    like 1e400 that overflows. orjson would write these as null, but it refuses float
+    subclasses, so _dumps_json hands them back to json unchanged.
+    """
+
+
+def _parse_float(s):
+    """json parse_float hook that tags literals overflowing to infinity."""
+    value = float(s)
+    return value if math.isfinite(value) else _NonFiniteFloat(value)
+
+
+# Digit run long enough to be an integer outside orjson's int64/uint64 range; those
+# below int64's minimum have 19 digits, those above uint64's maximum have 20
+_WIDE_INT_RE = re.compile(rb'\d{19}')
+
+SECONDS_PER_DAY = 86400
+# Timestamps outside datetime's year 1-9999 range cannot be given a date
+MIN_TS = -62135596800  # 0001-01-01T00:00:00Z
+MAX_TS = 253402300800  # 10000-01-01T00:00:00Z
+_date_cache = {}  # days since epoch -> 'YYYY-MM-DD'
+
+if njit is not None:
+    @njit(cache=True)
+    def _ts_to_day(ts):
+        out = np.empty(ts.size, np.int64)
+        for i in range(ts.size):
+            out[i] = int(ts[i] // SECONDS_PER_DAY)
+        return out
+
+
+def _day_indices(messages):
+    """
+    Returns the days-since-epoch index of each (ts, msg) pair, using a Numba-compiled
+    kernel when numba is installed.
+    """
+    if njit is not None:
+        ts = np.fromiter(map(itemgetter(0), messages), dtype=np.float64, count=len(messages))
+        return _ts_to_day(ts)
+    return [int(ts // SECONDS_PER_DAY) for ts, _ in messages]
+
+
+def _day_runs(days):
+    """
+    Returns (start, end, day) for each run of equal values in a sorted sequence of day
+    indices, so each date's messages can be taken as a single slice.
+    """
+    if len(days) == 0:
+        return []
+    if np is not None and isinstance(days, np.ndarray):
+        ends = np.flatnonzero(np.diff(days)) + 1
+        starts = np.r_[0, ends]
+        return zip(starts.tolist(), np.r_[ends, len(days)].tolist(), days[starts].tolist())
+    runs = []
+    start = 0
+    for i in range(1, len(days)):
+        if days[i] != days[i - 1]:
+            runs.append((start, i, days[start]))
+            start = i
+    runs.append((start, len(days), days[start]))
+    return runs
+
+
+def _date_for_day(day):
+    """
+    Returns the UTC 'YYYY-MM-DD' date for a days-since-epoch index. Exports span at most
+    a few thousand distinct days, so each day's string is formatted once and cached.
+    """
+    date_str = _date_cache.get(day)
+    if date_str is None:
+        date_str = datetime.utcfromtimestamp(day * SECONDS_PER_DAY).strftime('%Y-%m-%d')
+        _date_cache[day] = date_str
+    return date_str
+
+
+def _loads_json(data):
+    """
+    Parse UTF-8 JSON bytes, using orjson when it is installed and falling back to the
+    stdlib json module wherever orjson would reject or alter what json accepts.
+    """
+    # orjson turns integers outside int64/uint64 into floats without complaint, so any
+    # input with a 19+ digit run (which may be such an integer) goes to json instead
+    if orjson is not None and not _WIDE_INT_RE.search(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson also rejects lone surrogate escapes (e.g. truncated emoji in
+            # Slack text) and NaN/Infinity, which json accepts
+            pass
+    return json.loads(data.decode('utf-8'), parse_float=_parse_float, parse_constant=_NonFiniteFloat)
+
+
+def _load_json(path):
+    """Parse a JSON file, using orjson when it is installed."""
+    with open(path, 'rb') as f:
+        return _loads_json(f.read())
+
+
+def _dumps_json(obj):
+    """Serialize obj to UTF-8 JSON bytes, using orjson when it is installed."""
+    # Output is compact; RelativityOne does not need it pretty-printed
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # Lone surrogates, integers wider than 64 bits and _NonFiniteFloat, which
+            # only json handles
+            pass
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def _read_spill(path, offset, length):
+    """Returns the (ts, msg) rows in one day's span of a spill file."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    return [_loads_json(line) for line in data.splitlines()]
+
+
+def _dumps_messages(pairs):
+    """Serialize the messages of an iterable of (ts, msg) pairs to JSON bytes."""
+    return _dumps_json(list(map(itemgetter(1), pairs)))
+
+
+def _dumps_day(spans):
+    """
+    Reads one day's (path, offset, length) spill spans, sorts the day's messages by ts
+    and serializes them to JSON bytes. Only this day's messages are held in memory, and
+    spans are read one after another so only one file is open at a time.
+    """
+    pairs = []
+    for span in spans:
+        pairs.extend(_read_spill(*span))
+    # Spans are in input file order and the sort is stable, so ties keep that order
+    pairs.sort(key=itemgetter(0))
+    return _dumps_messages(pairs)
+
+
+def _make_user(user_id, team_id, profile):
+    """Builds a users.json record from a message's user_profile."""
+    get = profile.get
+    real_name = get('real_name', '')
+    return {
+        "id": user_id,
+        "team_id": team_id,
+        "name": get('name', ''),
+        "deleted": False,
+        "real_name": real_name,
+        "profile": {
+            "first_name": get('first_name', ''),
+            "last_name": '',
+            "real_name": real_name,
+            "display_name": get('display_name', ''),
+            "image_72": get('image_72', ''),
+            "avatar_hash": get('avatar_hash', '')
+        }
+    }
+
+
+def _parse_one(path, spill_dir, file_index):
+    """
+    Loads a single Slack JSON file, extracts its users and team counts, and spills its
+    messages, sorted by ts, to a '{file_index}.jsonl' file in spill_dir with one line per
+    message, so each day's messages occupy one contiguous span of the file.
+    Runs in a worker process, so errors are returned to the caller rather than printed.
+
+    Returns (msg_count, skipped_ids, day_spills, min_ts, users, team_counts, error).
+    msg_count includes messages without a usable ts and is None if the file is not a
+    message array. skipped_ids lists the client_msg_id of messages whose ts could not
+    be parsed or dated. day_spills maps each spilled day index to ((path, offset,
+    length), count) for its span of the spill file. min_ts is the earliest spilled ts
+    (or None), and error is the message of the exception raised while loading, if any.
+    Only the message is returned since exceptions can be large (JSONDecodeError holds
+    the whole document) or unpicklable.
+    """
+    messages = []  # (ts, msg)
+    msg_count = 0
+    skipped_ids = []
+    day_spills = {}  # day index -> ((spill path, offset, length), message count)
+    min_ts = None
+    users = {}  # user_id -> user dict
+    team_counts = Counter()  # team_id -> message count
+    try:
+        data = _load_json(path)
+        if not isinstance(data, list):
+            return None, skipped_ids, day_spills, None, users, team_counts, None
+        for msg in data:
+            if 'type' in msg and msg['type'] == 'message':
+                msg_count += 1
+                # Parse ts once here; it is reused for sorting, dating and the channel
+                ts = msg.get('ts')
+                if ts:
+                    try:
+                        ts_f = float(ts)
+                    except (ValueError, TypeError):
+                        ts_f = None
+                    # nan/inf would break the sort and out-of-range values cannot be
+                    # dated, so treat them as invalid too
+                    if ts_f is not None and MIN_TS <= ts_f < MAX_TS:
+                        messages.append((ts_f, msg))
+                    else:
+                        skipped_ids.append(msg.get('client_msg_id', 'NO_ID'))
+                # Extract user info; most messages are from already-known users, so
+                # test that before looking for a profile
+                user_id = msg.get('user')
+                if user_id and user_id not in users and 'user_profile' in msg:
+                    users[user_id] = _make_user(user_id, msg.get('team', ''), msg['user_profile'])
+                team = msg.get('team')
+                if team:
+                    team_counts[team] += 1
+
+        # Spill the sorted messages, recording where each date's contiguous run lands
+        messages.sort(key=itemgetter(0))
+        spill_path = os.path.join(spill_dir, f'{file_index}.jsonl')
+        with open(spill_path, 'wb') as f:
+            for start, end, day in _day_runs(_day_indices(messages)):
+                try:
+                    _date_for_day(day)
+                except (ValueError, OverflowError, OSError):
+                    skipped_ids.extend(msg.get('client_msg_id', 'NO_ID') for _, msg in messages[start:end])
+                    continue
+                # Runs are in ts order, so the first one spilled holds the earliest
+                # message that will actually be exported
+                if min_ts is None:
+                    min_ts = messages[start][0]
+                offset = f.tell()
+                f.writelines(_dumps_json(pair) + b'\n' for pair in messages[start:end])
+                day_spills[day] = ((spill_path, offset, f.tell() - offset), end - start)
+    except Exception as e:
+        return 0, [], {}, None, {}, Counter(), str(e)
+    return msg_count, skipped_ids, day_spills, min_ts, users, team_counts, None
+
+
+def package_slack_jsons_with_report(input_dir, output_zip=None, compress_level=1):
     """
     Packages loose Slack JSON message files into a standard Slack export ZIP structure
     for RelativityOne. Generates a report.txt listing all input JSON files and their
     message counts to confirm all were loaded.
+
+    compress_level is the DEFLATE level (0-9) used for the ZIP. The default of 1 is much
+    cheaper than zlib's usual 6 and JSON still compresses well at it.
     
     Outputs:
     - slack_export.zip (or specified path)
     - report.txt in input_dir listing all JSON files and message counts
     """
-    messages = []
     users = {}  # user_id -> user dict
-    teams = set()
+    team_counts = Counter()  # team_id -> message count
     input_files_info = {}  # filename -> message count
+    day_spans = defaultdict(list)  # day index -> spill spans, in input file order
+    day_counts = Counter()  # day index -> message count
+    min_ts = None
 
-    # Step 1: Load all JSON files and count messages
-    json_files = [f for f in os.listdir(input_dir) if f.endswith('.json')]
-    for filename in json_files:
-        path = os.path.join(input_dir, filename)
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            if isinstance(data, list):
-                msg_count = 0
-                for msg in data:
-                    if 'type' in msg and msg['type'] == 'message':
-                        messages.append(msg)
-                        msg_count += 1
-                        # Extract user info
-                        user_id = msg.get('user')
-                        if user_id and 'user_profile' in msg and user_id not in users:
-                            profile = msg['user_profile']
-                            users[user_id] = {
-                                "id": user_id,
-                                "team_id": msg.get('team', ''),
-                                "name": profile.get('name', ''),
-                                "deleted": False,
-                                "real_name": profile.get('real_name', ''),
-                                "profile": {
-                                    "first_name": profile.get('first_name', ''),
-                                    "last_name": '',
-                                    "real_name": profile.get('real_name', ''),
-                                    "display_name": profile.get('display_name', ''),
-                                    "image_72": profile.get('image_72', ''),
-                                    "avatar_hash": profile.get('avatar_hash', '')
-                                }
-                            }
-                        teams.add(msg.get('team', ''))
-                        teams.add(msg.get('source_team', ''))
-                        teams.add(msg.get('user_team', ''))
-                input_files_info[filename] = msg_count
-            else:
+    # Messages are spilled to disk, one file per input file, rather than held in one
+    # list, so peak memory is bounded by the largest day instead of the whole export
+    with tempfile.TemporaryDirectory() as spill_dir:
+        # Step 1: Load all JSON files in parallel and count messages
+        with os.scandir(input_dir) as entries:
+            json_files = [e.name for e in entries if e.name.endswith('.json') and e.is_file()]
+        # Sorted once here: this fixes the processing order and is reused by the report
+        json_files.sort()
+        # Names are bare basenames, so plain concatenation onto the prefix is enough
+        input_prefix = os.path.join(input_dir, '')  # with trailing separator
+        paths = [input_prefix + filename for filename in json_files]
+        with ProcessPoolExecutor() as executor:
+            results = list(executor.map(_parse_one, paths, repeat(spill_dir), range(len(paths)), chunksize=4))
+
+        # Merge in file order so the first profile seen for each user wins
+        for filename, result in zip(json_files, results):
+            msg_count, skipped_ids, file_day_spills, file_min_ts, file_users, file_team_counts, error = result
+            if error is not None:
+                input_files_info[filename] = 0
+                print(f"Error loading {filename}: {error}")
+            elif msg_count is None:
                 input_files_info[filename] = 0
                 print(f"Warning: {filename} is not a valid message array")
-        except Exception as e:
-            input_files_info[filename] = 0
-            print(f"Error loading {filename}: {e}")
-
-    if not messages:
-        raise ValueError("No valid messages found in the JSON files.")
-
-    # Step 2: Sort and group messages by date
-    messages.sort(key=lambda m: float(m.get('ts', 0)))
-    messages_by_date = defaultdict(list)
-    for msg in messages:
-        ts = msg.get('ts')
-        if ts:
-            try:
-                date_str = datetime.utcfromtimestamp(float(ts)).strftime('%Y-%m-%d')
-                messages_by_date[date_str].append(msg)
-            except (ValueError, TypeError):
-                print(f"Warning: Skipping message with invalid 'ts': {msg.get('client_msg_id', 'NO_ID')}")
-                continue
-
-    # Step 3: Infer channel and team
-    team_id = max(teams, key=list(teams).count) if teams else "T_UNKNOWN"
-    min_ts = float(min((msg['ts'] for msg in messages if msg.get('ts')), default=0))
-    creator = next(iter(users)) if users else "U_UNKNOWN"
-    members = list(users.keys())
-    channel = {
-        "id": "C_SEARCH_RESULTS",
-        "name": "search_results",
-        "created": int(min_ts),
-        "creator": creator,
-        "is_archived": False,
-        "is_mpim": False,
-        "members": members,
-        "topic": {"value": "", "creator": "", "last_set": 0},
-        "purpose": {"value": "Combined messages from search export", "creator": "", "last_set": 0}
-    }
-    channels = [channel]
-
-    # Step 4: Create ZIP and count output messages
-    output_files_info = {}  # date -> message count
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Write users.json
-        users_list = list(users.values())
-        users_path = os.path.join(temp_dir, 'users.json')
-        with open(users_path, 'w', encoding='utf-8') as f:
-            json.dump(users_list, f, indent=4)
-
-        # Write channels.json
-        channels_path = os.path.join(temp_dir, 'channels.json')
-        with open(channels_path, 'w', encoding='utf-8') as f:
-            json.dump(channels, f, indent=4)
-
-        # Write date.json files
-        channel_dir = os.path.join(temp_dir, channel['name'])
-        os.makedirs(channel_dir, exist_ok=True)
-        for date_str, msgs in messages_by_date.items():
-            date_path = os.path.join(channel_dir, f'{date_str}.json')
-            with open(date_path, 'w', encoding='utf-8') as f:
-                json.dump(msgs, f, indent=4)
-            output_files_info[date_str] = len(msgs)
-
-        # Set output ZIP path
+            else:
+                for msg_id in skipped_ids:
+                    print(f"Warning: Skipping message with invalid 'ts': {msg_id}")
+                for day, (span, count) in file_day_spills.items():
+                    day_spans[day].append(span)
+                    day_counts[day] += count
+                if file_min_ts is not None and (min_ts is None or file_min_ts < min_ts):
+                    min_ts = file_min_ts
+                for user_id, user in file_users.items():
+                    users.setdefault(user_id, user)
+                team_counts.update(file_team_counts)
+                input_files_info[filename] = msg_count
+
+        if not any(input_files_info.values()):
+            raise ValueError("No valid messages found in the JSON files.")
+
+        # Step 2: Order the dates; each is sorted when its spill spans are read
+        dates = [(_date_for_day(day), day_spans[day], day_counts[day]) for day in sorted(day_spans)]
+
+        # Step 3: Infer channel and team
+        team_id = team_counts.most_common(1)[0][0] if team_counts else "T_UNKNOWN"
+        creator = next(iter(users)) if users else "U_UNKNOWN"
+        members = list(users.keys())
+        channel = {
+            "id": "C_SEARCH_RESULTS",
+            "name": "search_results",
+            "created": int(min_ts or 0),
+            "creator": creator,
+            "is_archived": False,
+            "is_mpim": False,
+            "members": members,
+            "topic": {"value": "", "creator": "", "last_set": 0},
+            "purpose": {"value": "Combined messages from search export", "creator": "", "last_set": 0}
+        }
+        channels = [channel]
+
+        # Step 4: Create ZIP and count output messages
+        output_files_info = {}  # date -> message count
         if output_zip is None:
             output_zip = os.path.join(input_dir, 'slack_export.zip')
 
-        # Create ZIP
-        with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for root, _, files in os.walk(temp_dir):
-                for file in files:
-                    full_path = os.path.join(root, file)
-                    arcname = os.path.relpath(full_path, temp_dir)
-                    zf.write(full_path, arcname)
+        # Serialize straight into the archive rather than staging files on disk
+        with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED, compresslevel=compress_level) as zf:
+            # Worker threads serialize users.json, channels.json and the date files
+            # (merging each date's spill files) ahead of this thread, which compresses
+            # and writes them in order (zlib releases the GIL). ZipFile itself is not
+            # thread-safe, so only this thread touches it.
+            max_workers = os.cpu_count() or 1
+            pending = deque()  # (arcname, future of serialized bytes, date_str or None, message count)
+
+            def write_oldest():
+                arcname, future, date_str, count = pending.popleft()
+                zf.writestr(arcname, future.result())
+                if date_str is not None:
+                    output_files_info[date_str] = count
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                users_list = list(users.values())
+                pending.append(('users.json', executor.submit(_dumps_json, users_list), None, 0))
+                pending.append(('channels.json', executor.submit(_dumps_json, channels), None, 0))
+                for date_str, spans, count in dates:
+                    arcname = f"{channel['name']}/{date_str}.json"
+                    pending.append((arcname, executor.submit(_dumps_day, spans), date_str, count))
+                    # Bound how many days are held in memory at once
+                    if len(pending) > 2 * max_workers:
+                        write_oldest()
+                while pending:
+                    write_oldest()
 
     # Step 5: Write report.txt
     report_path = os.path.join(input_dir, 'report.txt')
     total_input_msgs = sum(input_files_info.values())
     total_output_msgs = sum(output_files_info.values())
+    # Build the whole report in memory and write it in one call
+    report = [
+        "Slack JSON Conversion Report\n",
+        f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n",
+        f"Input Directory: {input_dir}\n",
+        f"Output ZIP: {output_zip}\n\n",
+        f"Total JSON Files Processed: {len(json_files)}\n\n",
+        "Input JSON Files Loaded:\n",
+    ]
+    report.extend(f"  {filename}: {input_files_info.get(filename, 0)} messages\n" for filename in json_files)
+    report.append(f"\nTotal Input Messages: {total_input_msgs}\n")
+    report.append("Output Files Created (search_results/):\n")
+    # Dates were written, and so recorded, in chronological order
+    report.extend(f"  {date_str}.json: {count} messages\n" for date_str, count in output_files_info.items())
+    report.append(f"\nTotal Output Messages: {total_output_msgs}\n")
+    if total_input_msgs == total_output_msgs:
+        report.append("\nSummary: All messages from the 55 JSON files were successfully processed.\n")
+    else:
+        report.append("\nWarning: Input and output message counts differ. Check for invalid messages or errors.\n")
     with open(report_path, 'w', encoding='utf-8') as f:
-        f.write("Slack JSON Conversion Report\n")
-        f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write(f"Input Directory: {input_dir}\n")
-        f.write(f"Output ZIP: {output_zip}\n\n")
-        f.write(f"Total JSON Files Processed: {len(json_files)}\n\n")
-        f.write("Input JSON Files Loaded:\n")
-        for filename in sorted(json_files):
-            count = input_files_info.get(filename, 0)
-            f.write(f"  {filename}: {count} messages\n")
-        f.write(f"\nTotal Input Messages: {total_input_msgs}\n")
-        f.write("Output Files Created (search_results/):\n")
-        for date_str in sorted(output_files_info.keys()):
-            count = output_files_info[date_str]
-            f.write(f"  {date_str}.json: {count} messages\n")
-        f.write(f"\nTotal Output Messages: {total_output_msgs}\n")
-        if total_input_msgs == total_output_msgs:
-            f.write("\nSummary: All messages from the 55 JSON files were successfully processed.\n")
-        else:
-            f.write("\nWarning: Input and output message counts differ. Check for invalid messages or errors.\n")
+        f.write(''.join(report))
 
     print(f"ZIP created at: {output_zip}")
     print(f"Report saved to: {report_path}")